@@ -1,17 +1,140 @@
 """Authentication logic and utilities"""
+import asyncio
+import base64
+import hashlib
 import os
 import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from cachetools import TTLCache
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
-from .models import User, Session as SessionModel
+from sqlalchemy import DateTime, bindparam, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from . import session_cache
+from .models import User, Session as SessionModel, utcnow
 
-#Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+#Password hashing context - cost is tunable so login CPU can be traded against hash strength
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=BCRYPT_ROUNDS, deprecated="auto")
+
+#bcrypt gets its own pool sized to the CPUs - a login burst queues here instead of oversubscribing
+#the cores or starving the default executor that S3 and file I/O use
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
 
 #Session configuration
 SESSION_EXPIRY_DAYS = int(os.getenv("SESSION_EXPIRY_DAYS", "7"))
 
+#Failed-login throttling, two buckets; each window restarts on every failure:
+# - per (client IP, username): a guessed password locks that account for that client only
+# - per client IP, with a higher limit: caps username spraying (and the bcrypt work it costs)
+#   and keeps one client from flooding the account bucket to evict the entry it is attacking
+#client.host is only the real client when uvicorn trusts the proxy - set FORWARDED_ALLOW_IPS to the
+#proxy's address in the deploy .env, otherwise every request shares the proxy's IP and the per-IP
+#bucket becomes a global one
+LOGIN_MAX_FAILURES = int(os.getenv("LOGIN_MAX_FAILURES", "10"))
+LOGIN_MAX_FAILURES_PER_IP = int(os.getenv("LOGIN_MAX_FAILURES_PER_IP", "100"))
+LOGIN_FAILURE_WINDOW = int(os.getenv("LOGIN_FAILURE_WINDOW", "300"))  #Seconds
+_account_failures = TTLCache(maxsize=100000, ttl=LOGIN_FAILURE_WINDOW)
+_ip_failures = TTLCache(maxsize=10000, ttl=LOGIN_FAILURE_WINDOW)
+_login_failures_lock = threading.Lock()
+
+_B64ENCODE = base64.urlsafe_b64encode
+
+#Hot-path lookups built once so SQLAlchemy reuses the compiled SQL from its statement cache
+_ACTIVE_USER_BY_USERNAME = select(User).where(
+    User.username == bindparam("username"),
+    User.is_active == True
+)
+_ACTIVE_USER_BY_ID = select(User).where(
+    User.id == bindparam("user_id"),
+    User.is_active == True
+)
+_VALID_SESSION_BY_TOKEN = select(SessionModel).where(
+    SessionModel.session_token == bindparam("token_hash"),
+    SessionModel.is_valid == True
+)
+_SESSION_BY_TOKEN = select(SessionModel).where(
+    SessionModel.session_token == bindparam("token_hash")
+)
+#Registration conflict check - always one row of two flags, no user rows materialized
+_USER_CONFLICT = select(
+    func.count().filter(User.username == bindparam("username")) > 0,
+    func.count().filter(User.email == bindparam("email")) > 0
+).where(or_(User.username == bindparam("username"), User.email == bindparam("email")))
+
+
+#User columns copied into the session cache - never password_hash, the cache may be a shared Redis
+_CACHED_USER_FIELDS = (
+    "id", "username", "email", "full_name", "is_active", "is_admin", "created_at", "last_login_at"
+)
+
+#Cached columns holding datetimes - stored as ISO strings so entries are JSON-serializable
+_USER_DATETIME_FIELDS = frozenset(
+    key for key in _CACHED_USER_FIELDS if isinstance(User.__table__.c[key].type, DateTime)
+)
+
+
+def _snapshot_user(user: User) -> dict:
+    """Copy a user's public column values so the cache never holds session-bound ORM objects"""
+    snapshot = {key: getattr(user, key) for key in _CACHED_USER_FIELDS}
+    for key in _USER_DATETIME_FIELDS:
+        if snapshot[key] is not None:
+            snapshot[key] = snapshot[key].isoformat()
+    return snapshot
+
+
+async def _restore_user(db: AsyncSession, snapshot: dict) -> User:
+    """Attach a cached user snapshot to the current session without querying"""
+    values = dict(snapshot)
+    for key in _USER_DATETIME_FIELDS:
+        if values[key] is not None:
+            values[key] = datetime.fromisoformat(values[key])
+    user = User(**values)
+    make_transient_to_detached(user)
+    return await db.merge(user, load=False)
+
+
+async def evict_cached_session(token_hash: bytes) -> None:
+    """Drop a session from the validation cache by its stored token hash"""
+    await session_cache.evict(token_hash)
+
+
+async def evict_cached_user(user_id: int) -> None:
+    """Drop every cached session belonging to a user (after admin changes)"""
+    await session_cache.evict_user(user_id)
+
+
+def is_login_throttled(client_ip: str, username: str) -> bool:
+    """Check if a client has exceeded the allowed failed logins, overall or for this username"""
+    with _login_failures_lock:
+        return (
+            _ip_failures.get(client_ip, 0) >= LOGIN_MAX_FAILURES_PER_IP
+            or _account_failures.get((client_ip, username), 0) >= LOGIN_MAX_FAILURES
+        )
+
+
+def record_login_failure(client_ip: str, username: str) -> None:
+    """Count a failed login against both the client and the client/username buckets"""
+    key = (client_ip, username)
+    with _login_failures_lock:
+        _ip_failures[client_ip] = _ip_failures.get(client_ip, 0) + 1
+        _account_failures[key] = _account_failures.get(key, 0) + 1
+
+
+def clear_login_failures(client_ip: str, username: str) -> None:
+    """Reset the client/username count after a successful login"""
+    #The per-IP count is left to expire - one valid account must not reset a spraying client
+    with _login_failures_lock:
+        _account_failures.pop((client_ip, username), None)
+
+
+async def run_hashing(fn, *args):
+    """Run a password-hashing call on the bounded bcrypt pool"""
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt"""
@@ -24,104 +147,138 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 
 def generate_session_token() -> str:
-    """Generate a cryptographically secure session token"""
-    return secrets.token_urlsafe(32)
+    """Generate a cryptographically secure session token (URL-safe base64 of 32 random bytes)"""
+    return _B64ENCODE(secrets.token_bytes(32)).rstrip(b"=").decode("ascii")
+
+
+def hash_session_token(session_token: str) -> bytes:
+    """Hash a session token for storage - only the digest is kept in the database"""
+    return hashlib.blake2b(session_token.encode(), digest_size=32).digest()
 
 
-def create_session(db: Session, user_id: int) -> str:
-    """Create a new session for a user and return the session token"""
+def create_session(db: AsyncSession, user_id: int) -> str:
+    """Create a new session for a user and return the session token (caller commits)"""
     #Generate unique session token
     session_token = generate_session_token()
 
     #Calculate expiration time
-    expires_at = datetime.utcnow() + timedelta(days=SESSION_EXPIRY_DAYS)
+    expires_at = utcnow() + timedelta(days=SESSION_EXPIRY_DAYS)
 
-    #Create session record
+    #Create session record - the cookie carries the raw token, the database its hash
     session = SessionModel(
         user_id=user_id,
-        session_token=session_token,
+        session_token=hash_session_token(session_token),
         expires_at=expires_at,
         is_valid=True
     )
 
     db.add(session)
-    db.commit()
-    db.refresh(session)
 
     return session_token
 
 
-def authenticate_user(db: Session, username: str, password: str) -> User | None:
-    """Authenticate a user by username and password"""
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> User | None:
+    """Authenticate a user by username and password (caller commits)"""
+    #Database work stays on the event loop; bcrypt runs on the hashing pool so it doesn't block it
     #Find active user
-    user = db.query(User).filter(
-        User.username == username,
-        User.is_active == True
-    ).first()
+    user = (await db.execute(_ACTIVE_USER_BY_USERNAME, {"username": username})).scalar_one_or_none()
 
     if not user:
+        #Spend the same hashing time as a real check so response timing doesn't reveal usernames
+        await run_hashing(pwd_context.dummy_verify)
         return None
 
     #Verify password
-    if not verify_password(password, user.password_hash):
+    if not await run_hashing(verify_password, password, user.password_hash):
         return None
 
+    #Rehash lazily if the stored hash uses an outdated scheme or cost
+    if pwd_context.needs_update(user.password_hash):
+        user.password_hash = await run_hashing(hash_password, password)
+
     #Update last login timestamp
-    user.last_login_at = datetime.utcnow()
-    db.commit()
+    user.last_login_at = utcnow()
 
     return user
 
 
-def validate_session(db: Session, session_token: str) -> User | None:
+async def validate_session(db: AsyncSession, session_token: str) -> User | None:
     """Validate a session token and return the associated user"""
+    #Hot path on every authenticated request - token lookup only, never verify_password here
+    if not session_token:
+        return None
+
+    now = utcnow()
+    token_hash = hash_session_token(session_token)
+
+    #Serve recently validated sessions from the cache
+    cached = await session_cache.get(token_hash)
+    if cached and datetime.fromisoformat(cached["expires_at"]) >= now:
+        return await _restore_user(db, cached["user"])
+
     #Find session
-    session = db.query(SessionModel).filter(
-        SessionModel.session_token == session_token,
-        SessionModel.is_valid == True
-    ).first()
+    session = (await db.execute(_VALID_SESSION_BY_TOKEN, {"token_hash": token_hash})).scalar_one_or_none()
 
     if not session:
+        await evict_cached_session(token_hash)
         return None
 
     #Check if session is expired
-    if session.expires_at < datetime.utcnow():
+    if session.expires_at < now:
         #Invalidate expired session
         session.is_valid = False
-        db.commit()
+        await db.commit()
+        await evict_cached_session(token_hash)
         return None
 
     #Get user
-    user = db.query(User).filter(
-        User.id == session.user_id,
-        User.is_active == True
-    ).first()
+    user = (await db.execute(_ACTIVE_USER_BY_ID, {"user_id": session.user_id})).scalar_one_or_none()
+
+    if user:
+        entry = {"expires_at": session.expires_at.isoformat(), "user": _snapshot_user(user)}
+        await session_cache.store(token_hash, entry, session.expires_at)
 
     return user
 
 
-def invalidate_session(db: Session, session_token: str) -> bool:
+async def invalidate_session(db: AsyncSession, session_token: str) -> bool:
     """Invalidate a session (logout)"""
-    session = db.query(SessionModel).filter(
-        SessionModel.session_token == session_token
-    ).first()
+    token_hash = hash_session_token(session_token)
+    session = (await db.execute(_SESSION_BY_TOKEN, {"token_hash": token_hash})).scalar_one_or_none()
 
     if not session:
+        await evict_cached_session(token_hash)
         return False
 
     session.is_valid = False
-    db.commit()
+    await db.commit()
+
+    #Evict only once the update is committed - evicting earlier lets a concurrent validation re-cache the live row
+    await evict_cached_session(token_hash)
     return True
 
 
+async def find_user_conflict(db: AsyncSession, username: str, email: str) -> str | None:
+    """Check username and email uniqueness in one query and return the conflict message, if any"""
+    username_taken, email_taken = (await db.execute(
+        _USER_CONFLICT, {"username": username, "email": email}
+    )).one()
+
+    if username_taken:
+        return "Username already exists"
+    if email_taken:
+        return "Email already exists"
+    return None
+
+
 def verify_admin(user: User) -> bool:
     """Verify if a user has admin privileges"""
     return user.is_active and user.is_admin
 
 
-def get_admin_user(db: Session, session_token: str) -> User | None:
+async def get_admin_user(db: AsyncSession, session_token: str) -> User | None:
     """Validate session and verify admin privileges"""
-    user = validate_session(db, session_token)
+    user = await validate_session(db, session_token)
     if not user or not verify_admin(user):
         return None
     return user
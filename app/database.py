@@ -1,6 +1,7 @@
 """Database configuration and session management"""
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -14,20 +15,33 @@ DATABASE_URL = os.getenv(
 if DATABASE_URL.startswith("postgresql://"):
     DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+psycopg://", 1)
 
-#Create database engine
-engine = create_engine(DATABASE_URL)
+#Connection pool settings - keep warm connections and drop stale ones before use
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_POOL_OVERFLOW = int(os.getenv("DB_POOL_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  #Seconds
 
-#Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+#Create sync database engine - used for schema creation and tooling only
+engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+
+#Create async database engine for request handling (psycopg3 runs natively on asyncio)
+async_engine = create_async_engine(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_POOL_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_use_lifo=True  #Reuse the most recent connection so idle ones can expire
+)
+
+#Create session factories - keep loaded attributes after commit instead of re-selecting them
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 #Base class for models
 Base = declarative_base()
 
 
-def get_db():
-    """Dependency for getting database session"""
-    db = SessionLocal()
-    try:
+async def get_db():
+    """Dependency for getting async database session"""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
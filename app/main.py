@@ -1,19 +1,40 @@
 """FastAPI authentication service main application"""
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from .database import engine, Base
 from .routers import auth, audio, admin
+from .upload_limit import BodySizeLimitMiddleware
+
+#Schema is owned by init_db.sql and migrations/ - only auto-create tables when explicitly enabled (dev)
+AUTO_CREATE_SCHEMA = os.getenv("AUTO_CREATE_SCHEMA") == "1"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create database tables on startup when AUTO_CREATE_SCHEMA=1"""
+    if AUTO_CREATE_SCHEMA:
+        Base.metadata.create_all(bind=engine)
+    yield
 
-#Create database tables
-Base.metadata.create_all(bind=engine)
 
 #Initialize FastAPI app
 app = FastAPI(
     title="Transcribe Auth Service",
     description="Authentication service for Cloud-Lord Transcription Stack",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse  #Rust-backed JSON encoding for all responses
+)
+
+#Cap upload bodies before Starlette buffers them (added first so CORS headers still wrap the 413)
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    paths=["/api/audio/upload"],
+    max_body_size=audio.MAX_UPLOAD_BODY
 )
 
 #CORS configuration - only allow transcribe.cloud-lord.com
@@ -31,6 +52,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
+    expose_headers=[admin.NEXT_PAGE_HEADER],  #Let browser clients read the pagination cursor
 )
 
 #Include routers
@@ -52,3 +74,9 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("app.main:app", host="0.0.0.0", port=int(os.getenv("PORT", "80")), loop="uvloop", http="httptools")
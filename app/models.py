@@ -1,13 +1,22 @@
 """Database models for authentication"""
-from datetime import datetime
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey
+from datetime import datetime, timezone
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, Index, LargeBinary, text
 from sqlalchemy.orm import relationship
 from .database import Base
 
 
+def utcnow() -> datetime:
+    """Current UTC time as a naive datetime, matching the TIMESTAMP columns"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class User(Base):
     """User model for authentication"""
     __tablename__ = "users"
+    __table_args__ = (
+        #Login lookup only ever targets active users
+        Index("idx_users_username_active", "username", postgresql_where=text("is_active")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(100), unique=True, nullable=False, index=True)
@@ -17,7 +26,7 @@ class User(Base):
     is_active = Column(Boolean, default=True, nullable=False)
     is_admin = Column(Boolean, default=False, nullable=False)
     last_login_at = Column(DateTime, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=utcnow, nullable=False)
 
     #Relationship to sessions (one-to-many)
     sessions = relationship("Session", back_populates="user", cascade="all, delete-orphan")
@@ -29,12 +38,17 @@ class User(Base):
 class Session(Base):
     """Session model for tracking user sessions"""
     __tablename__ = "sessions"
+    __table_args__ = (
+        #Session validation only ever targets valid sessions
+        Index("idx_sessions_token_valid", "session_token", postgresql_where=text("is_valid")),
+        Index("idx_sessions_user_valid", "user_id", "is_valid"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
-    session_token = Column(String(255), unique=True, nullable=False, index=True)
+    session_token = Column(LargeBinary(32), unique=True, nullable=False, index=True)  #BLAKE2b digest of the cookie token
     expires_at = Column(DateTime, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=utcnow, nullable=False)
     is_valid = Column(Boolean, default=True, nullable=False)
 
     #Relationship to user (many-to-one)
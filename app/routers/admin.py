@@ -1,7 +1,10 @@
 """Admin endpoints"""
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Cookie
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Cookie, Query, Response
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..database import get_db
 from ..models import User, Session as SessionModel
@@ -15,44 +18,65 @@ from ..schemas import (
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
+#Page size limits for list endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+#Response header carrying the after_id for the next page - absent on the last page
+NEXT_PAGE_HEADER = "X-Next-After-Id"
+
+#List validators built once - validates whole result sets in a single call
+_user_list_adapter = TypeAdapter(list[UserListResponse])
+_session_list_adapter = TypeAdapter(list[SessionListResponse])
+
+
+def _set_next_page(response: Response, page_ids: list[int], limit: int) -> None:
+    """Point the client at the next page when the query found more rows than the page holds"""
+    if len(page_ids) > limit:
+        response.headers[NEXT_PAGE_HEADER] = str(page_ids[limit - 1])
+
 
 @router.get("/users", response_model=list[UserListResponse])
 async def list_users(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = Query(None, description="Return users with id greater than this (last id of previous page)"),
     session_token: Optional[str] = Cookie(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """List all users (admin only)"""
-    admin_user = auth.get_admin_user(db, session_token)
+    """List users ordered by id, one page at a time (admin only)"""
+    admin_user = await auth.get_admin_user(db, session_token)
     if not admin_user:
         raise HTTPException(status_code=403, detail="Admin access required")
 
-    users = db.query(User).all()
-    return [UserListResponse.from_orm(user) for user in users]
+    #Keyset pagination - cost stays constant however deep the page; one extra row tells whether more follow
+    stmt = select(User).order_by(User.id).limit(limit + 1)
+    if after_id is not None:
+        stmt = stmt.where(User.id > after_id)
+
+    users = (await db.execute(stmt)).scalars().all()
+    _set_next_page(response, [user.id for user in users], limit)
+    return _user_list_adapter.validate_python(users[:limit], from_attributes=True)
 
 
 @router.post("/users", response_model=UserListResponse)
 async def create_user(
     request: CreateUserRequest,
     session_token: Optional[str] = Cookie(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new user (admin only)"""
-    admin_user = auth.get_admin_user(db, session_token)
+    admin_user = await auth.get_admin_user(db, session_token)
     if not admin_user:
         raise HTTPException(status_code=403, detail="Admin access required")
 
-    #Check if username already exists
-    existing_user = db.query(User).filter(User.username == request.username).first()
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Username already exists")
-
-    #Check if email already exists
-    existing_email = db.query(User).filter(User.email == request.email).first()
-    if existing_email:
-        raise HTTPException(status_code=400, detail="Email already exists")
+    #Check if username or email already exists
+    conflict = await auth.find_user_conflict(db, request.username, request.email)
+    if conflict:
+        raise HTTPException(status_code=400, detail=conflict)
 
     #Create new user
-    hashed_password = auth.hash_password(request.password)
+    hashed_password = await auth.run_hashing(auth.hash_password, request.password)
     new_user = User(
         username=request.username,
         email=request.email,
@@ -63,10 +87,14 @@ async def create_user(
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        #Lost a race with a concurrent registration of the same username/email
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Username or email already exists")
 
-    return UserListResponse.from_orm(new_user)
+    return UserListResponse.model_validate(new_user)
 
 
 @router.put("/users/{user_id}", response_model=UserListResponse)
@@ -74,14 +102,14 @@ async def update_user(
     user_id: int,
     request: UpdateUserRequest,
     session_token: Optional[str] = Cookie(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a user (admin only)"""
-    admin_user = auth.get_admin_user(db, session_token)
+    admin_user = await auth.get_admin_user(db, session_token)
     if not admin_user:
         raise HTTPException(status_code=403, detail="Admin access required")
 
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -101,24 +129,24 @@ async def update_user(
     if request.full_name is not None:
         user.full_name = request.full_name
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await auth.evict_cached_user(user.id)
 
-    return UserListResponse.from_orm(user)
+    return UserListResponse.model_validate(user)
 
 
 @router.delete("/users/{user_id}")
 async def delete_user(
     user_id: int,
     session_token: Optional[str] = Cookie(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a user (admin only)"""
-    admin_user = auth.get_admin_user(db, session_token)
+    admin_user = await auth.get_admin_user(db, session_token)
     if not admin_user:
         raise HTTPException(status_code=403, detail="Admin access required")
 
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -126,56 +154,69 @@ async def delete_user(
     if user.id == admin_user.id:
         raise HTTPException(status_code=400, detail="Cannot delete your own account")
 
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
+    await auth.evict_cached_user(user_id)
 
     return {"success": True, "message": "User deleted successfully"}
 
 
 @router.get("/sessions", response_model=list[SessionListResponse])
 async def list_sessions(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = Query(None, description="Return sessions with id greater than this (last id of previous page)"),
     session_token: Optional[str] = Cookie(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """List all active sessions (admin only)"""
-    admin_user = auth.get_admin_user(db, session_token)
+    """List sessions ordered by id, one page at a time (admin only)"""
+    admin_user = await auth.get_admin_user(db, session_token)
     if not admin_user:
         raise HTTPException(status_code=403, detail="Admin access required")
 
-    #Get all sessions with user information
-    sessions = db.query(SessionModel).join(User).all()
+    #Get a page of sessions with their usernames in a single query
+    stmt = (
+        select(SessionModel, User.username)
+        .join(User, SessionModel.user_id == User.id)
+        .order_by(SessionModel.id)
+        .limit(limit + 1)  #One extra row tells whether another page follows
+    )
+    if after_id is not None:
+        stmt = stmt.where(SessionModel.id > after_id)
 
-    result = []
-    for session in sessions:
-        user = db.query(User).filter(User.id == session.user_id).first()
-        result.append({
+    rows = (await db.execute(stmt)).all()
+    _set_next_page(response, [session.id for session, _ in rows], limit)
+
+    return _session_list_adapter.validate_python([
+        {
             "id": session.id,
             "user_id": session.user_id,
-            "username": user.username if user else "Unknown",
-            "created_at": session.created_at.isoformat(),
-            "expires_at": session.expires_at.isoformat(),
+            "username": username,
+            "created_at": session.created_at,
+            "expires_at": session.expires_at,
             "is_valid": session.is_valid
-        })
-
-    return result
+        }
+        for session, username in rows[:limit]
+    ])
 
 
 @router.delete("/sessions/{session_id}")
 async def revoke_session(
     session_id: int,
     session_token: Optional[str] = Cookie(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Revoke a session (admin only)"""
-    admin_user = auth.get_admin_user(db, session_token)
+    admin_user = await auth.get_admin_user(db, session_token)
     if not admin_user:
         raise HTTPException(status_code=403, detail="Admin access required")
 
-    session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
+    session = await db.get(SessionModel, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
     session.is_valid = False
-    db.commit()
+    await db.commit()
+    await auth.evict_cached_session(session.session_token)
 
     return {"success": True, "message": "Session revoked successfully"}
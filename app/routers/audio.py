@@ -1,92 +1,142 @@
 """Audio upload endpoints"""
+import asyncio
 import os
-import uuid
-from datetime import datetime
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Cookie, UploadFile, File
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from botocore.exceptions import ClientError
 import magic
 
 from ..database import get_db
+from ..models import utcnow
 from .. import auth
-from ..schemas import AudioUploadResponse
-from ..s3_client import get_s3_client, S3_BUCKET
+from ..schemas import (
+    AudioUploadResponse,
+    AudioUploadUrlRequest,
+    AudioUploadUrlResponse,
+    AudioUploadConfirmRequest
+)
+from ..s3_client import get_s3_client, S3_BUCKET, TRANSFER_CONFIG
 
 router = APIRouter(prefix="/api/audio", tags=["audio"])
 
+#MIME detector loaded once - Magic serializes calls on its own lock, so sharing it is safe
+_MIME = magic.Magic(mime=True)
 
-@router.post("/upload", response_model=AudioUploadResponse)
-async def upload_audio(
-    audio: UploadFile = File(...),
-    session_token: Optional[str] = Cookie(None),
-    db: Session = Depends(get_db)
-):
-    """Upload audio file to S3 (requires authentication)"""
-    #Validate session
+#Bytes inspected for MIME detection - libmagic identifies WAV from the RIFF header
+MIME_SNIFF_BYTES = 4096
+
+#Upload size limits (min 1KB, max 50MB)
+MIN_UPLOAD_SIZE = 1024  #1KB
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024  #50MB
+MAX_UPLOAD_BODY = MAX_UPLOAD_SIZE + 64 * 1024  #Allowance for multipart framing around the file
+
+#Accepted audio types
+ALLOWED_MIME_TYPES = frozenset({
+    'audio/wav',
+    'audio/wave',
+    'audio/x-wav'
+})
+ALLOWED_MIME_TYPES_TEXT = ', '.join(sorted(ALLOWED_MIME_TYPES))  #For error messages
+
+#Lifetime of presigned direct-to-S3 upload forms
+PRESIGNED_UPLOAD_EXPIRY = int(os.getenv("PRESIGNED_UPLOAD_EXPIRY", "300"))  #Seconds
+
+#Key prefixes - recordings live under audio/; direct uploads land in pending/ and are only copied
+#into audio/ by /confirm once their content checks out. Unconfirmed objects are expired by the
+#bucket lifecycle rule in s3-lifecycle.json (aws s3api put-bucket-lifecycle-configuration replaces the
+#bucket's existing rules, so merge it with any that are already set)
+UPLOAD_PREFIX = "audio"
+PENDING_UPLOAD_PREFIX = "pending"
+
+
+async def _require_user(db: AsyncSession, session_token: Optional[str]):
+    """Resolve the session cookie to a user or raise 401"""
     if not session_token:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    user = auth.validate_session(db, session_token)
+    user = await auth.validate_session(db, session_token)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid or expired session")
+    return user
+
 
-    #Validate file type
-    ALLOWED_MIME_TYPES = [
-        'audio/wav',
-        'audio/wave',
-        'audio/x-wav'
-    ]
+def _new_upload_key(username: str, original_filename: str, prefix: str = UPLOAD_PREFIX) -> tuple[str, str]:
+    """Build a unique S3 key for a user's recording, returned with its ISO upload timestamp"""
+    #Filename matches frontend format (voice_recording_YYYY-MM-DDTHH-MM-SS-mmmZ.wav)
+    #Use ISO 8601 format with colons and dots as dashes for filesystem compatibility
+    now = utcnow()
+    timestamp = now.strftime('%Y-%m-%dT%H-%M-%S-%f')
+    file_extension = os.path.splitext(original_filename)[1] or '.wav'
+    return f"{prefix}/{username}/voice_recording_{timestamp}Z{file_extension}", now.isoformat()
 
-    #Read file content
-    content = await audio.read()
 
-    #Validate file size (min 1KB, max 50MB)
-    file_size = len(content)
-    MIN_SIZE = 1024  #1KB
-    MAX_SIZE = 50 * 1024 * 1024  #50MB
+def _upload_metadata(user, original_filename: str, upload_timestamp: str) -> dict[str, str]:
+    """S3 object metadata recorded for every upload"""
+    return {
+        'user_id': str(user.id),
+        'username': user.username,
+        'original_filename': original_filename,
+        'upload_timestamp': upload_timestamp
+    }
 
-    if file_size < MIN_SIZE:
+
+@router.post("/upload", response_model=AudioUploadResponse)
+async def upload_audio(
+    audio: UploadFile = File(...),
+    session_token: Optional[str] = Cookie(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Upload audio file to S3 (requires authentication)"""
+    #Determine file size from the spooled upload without reading it into memory
+    file_size = audio.size
+    if file_size is None:
+        audio.file.seek(0, os.SEEK_END)
+        file_size = audio.file.tell()
+        audio.file.seek(0)
+
+    #Validate file size
+    if file_size < MIN_UPLOAD_SIZE:
         raise HTTPException(
             status_code=400,
-            detail=f"File too small ({file_size} bytes). Minimum size is {MIN_SIZE} bytes."
+            detail=f"File too small ({file_size} bytes). Minimum size is {MIN_UPLOAD_SIZE} bytes."
         )
 
-    if file_size > MAX_SIZE:
+    if file_size > MAX_UPLOAD_SIZE:
         raise HTTPException(
             status_code=400,
-            detail=f"File too large ({file_size} bytes). Maximum size is {MAX_SIZE} bytes."
+            detail=f"File too large ({file_size} bytes). Maximum size is {MAX_UPLOAD_SIZE} bytes."
         )
 
-    #Detect MIME type
-    mime = magic.from_buffer(content, mime=True)
+    #Validate session - after the cheap size checks so garbage uploads never cost a session lookup
+    user = await _require_user(db, session_token)
+
+    #Detect MIME type from the file header only
+    head = await audio.read(MIME_SNIFF_BYTES)
+    await audio.seek(0)
+    mime = _MIME.from_buffer(head)
     if mime not in ALLOWED_MIME_TYPES:
         raise HTTPException(
             status_code=400,
-            detail=f"Invalid file type: {mime}. Allowed types: {', '.join(ALLOWED_MIME_TYPES)}"
+            detail=f"Invalid file type: {mime}. Allowed types: {ALLOWED_MIME_TYPES_TEXT}"
         )
 
-    #Generate unique filename matching frontend format (voice_recording_YYYY-MM-DDTHH-MM-SS-mmmZ.wav)
-    #Use ISO 8601 format with colons and dots replaced by dashes for filesystem compatibility
-    timestamp = datetime.utcnow().isoformat().replace(':', '-').replace('.', '-')
-    file_extension = os.path.splitext(audio.filename)[1] or '.wav'
-    filename = f"voice_recording_{timestamp}Z{file_extension}"
-    s3_key = f"audio/{user.username}/{filename}"
+    #Generate unique key
+    s3_key, now_iso = _new_upload_key(user.username, audio.filename)
 
     try:
-        #Upload to S3
+        #Stream to S3 (multipart for large files) in a worker thread so the event loop stays free
         s3_client = get_s3_client()
-        s3_client.put_object(
-            Bucket=S3_BUCKET,
-            Key=s3_key,
-            Body=content,
-            ContentType=mime,
-            Metadata={
-                'user_id': str(user.id),
-                'username': user.username,
-                'original_filename': audio.filename,
-                'upload_timestamp': datetime.utcnow().isoformat()
-            }
+        await asyncio.to_thread(
+            s3_client.upload_fileobj,
+            audio.file,
+            S3_BUCKET,
+            s3_key,
+            ExtraArgs={
+                'ContentType': mime,
+                'Metadata': _upload_metadata(user, audio.filename, now_iso)
+            },
+            Config=TRANSFER_CONFIG
         )
 
         return AudioUploadResponse(
@@ -95,7 +145,7 @@ async def upload_audio(
             filename=audio.filename,
             s3_key=s3_key,
             size=file_size,
-            upload_timestamp=datetime.utcnow().isoformat()
+            upload_timestamp=now_iso
         )
 
     except ClientError as e:
@@ -110,3 +160,122 @@ async def upload_audio(
             status_code=500,
             detail=f"Upload failed: {str(e)}"
         )
+
+
+@router.post("/upload-url", response_model=AudioUploadUrlResponse)
+async def create_upload_url(
+    request: AudioUploadUrlRequest,
+    session_token: Optional[str] = Cookie(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Issue a presigned S3 POST so the client uploads straight to S3 (requires authentication)"""
+    user = await _require_user(db, session_token)
+
+    if request.content_type not in ALLOWED_MIME_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type: {request.content_type}. Allowed types: {ALLOWED_MIME_TYPES_TEXT}"
+        )
+
+    #Staged under pending/ - nothing reaches audio/ without passing /confirm
+    s3_key, now_iso = _new_upload_key(user.username, request.filename, PENDING_UPLOAD_PREFIX)
+
+    #Same metadata as server-side uploads; each field is pinned by a policy condition so the client cannot change it
+    fields = {'Content-Type': request.content_type}
+    for name, value in _upload_metadata(user, request.filename, now_iso).items():
+        fields[f'x-amz-meta-{name}'] = value
+    conditions = [{name: value} for name, value in fields.items()]
+    conditions.append(['content-length-range', MIN_UPLOAD_SIZE, MAX_UPLOAD_SIZE])
+
+    try:
+        presigned = await asyncio.to_thread(
+            get_s3_client().generate_presigned_post,
+            Bucket=S3_BUCKET,
+            Key=s3_key,
+            Fields=fields,
+            Conditions=conditions,
+            ExpiresIn=PRESIGNED_UPLOAD_EXPIRY
+        )
+    except ClientError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Could not create upload URL: {e.response['Error']['Code']}"
+        )
+
+    return AudioUploadUrlResponse(
+        url=presigned['url'],
+        fields=presigned['fields'],
+        s3_key=s3_key,
+        expires_in=PRESIGNED_UPLOAD_EXPIRY
+    )
+
+
+@router.post("/confirm", response_model=AudioUploadResponse)
+async def confirm_upload(
+    request: AudioUploadConfirmRequest,
+    session_token: Optional[str] = Cookie(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Verify a direct-to-S3 upload is a WAV file and move it into the recordings prefix (requires authentication)"""
+    user = await _require_user(db, session_token)
+
+    #Keys are issued under the user's pending prefix - never confirm someone else's object
+    pending_prefix = f"{PENDING_UPLOAD_PREFIX}/{user.username}/"
+    if not request.s3_key.startswith(pending_prefix):
+        raise HTTPException(status_code=403, detail="Upload does not belong to this user")
+    s3_key = f"{UPLOAD_PREFIX}/{user.username}/{request.s3_key[len(pending_prefix):]}"
+
+    s3_client = get_s3_client()
+    try:
+        #Ranged read of the header only - enough for MIME detection, and the response carries size and metadata
+        obj = await asyncio.to_thread(
+            s3_client.get_object,
+            Bucket=S3_BUCKET,
+            Key=request.s3_key,
+            Range=f"bytes=0-{MIME_SNIFF_BYTES - 1}"
+        )
+        head = await asyncio.to_thread(obj['Body'].read)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            raise HTTPException(status_code=404, detail="Upload not found")
+        raise HTTPException(
+            status_code=500,
+            detail=f"S3 lookup failed: {e.response['Error']['Code']} - {e.response['Error']['Message']}"
+        )
+
+    metadata = obj['Metadata']
+    if metadata.get('user_id') != str(user.id):
+        raise HTTPException(status_code=403, detail="Upload does not belong to this user")
+
+    #Content-Type was declared by the client - remove objects that are not actually audio
+    mime = _MIME.from_buffer(head)
+    if mime not in ALLOWED_MIME_TYPES:
+        await asyncio.to_thread(s3_client.delete_object, Bucket=S3_BUCKET, Key=request.s3_key)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type: {mime}. Allowed types: {ALLOWED_MIME_TYPES_TEXT}"
+        )
+
+    try:
+        #Server-side copy keeps the pinned Content-Type and metadata; a failed delete is left to the lifecycle rule
+        await asyncio.to_thread(
+            s3_client.copy_object,
+            Bucket=S3_BUCKET,
+            Key=s3_key,
+            CopySource={'Bucket': S3_BUCKET, 'Key': request.s3_key}
+        )
+        await asyncio.to_thread(s3_client.delete_object, Bucket=S3_BUCKET, Key=request.s3_key)
+    except ClientError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"S3 upload failed: {e.response['Error']['Code']} - {e.response['Error']['Message']}"
+        )
+
+    return AudioUploadResponse(
+        success=True,
+        message="Audio file uploaded successfully",
+        filename=metadata.get('original_filename', ''),
+        s3_key=s3_key,
+        size=int(obj['ContentRange'].rsplit('/', 1)[1]),  #"bytes 0-4095/<total>"
+        upload_timestamp=metadata.get('upload_timestamp', '')
+    )
@@ -1,7 +1,9 @@
 """Authentication endpoints"""
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Response, Cookie
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Cookie
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..database import get_db
 from ..models import User
@@ -16,25 +18,37 @@ from ..schemas import (
 router = APIRouter(prefix="/api/auth", tags=["authentication"])
 
 
+def _json_response(model: BaseModel) -> Response:
+    """Serialize an already-validated model once, skipping FastAPI's response_model re-validation"""
+    return Response(content=model.model_dump_json(), media_type="application/json")
+
+
+def _set_session_cookie(response: Response, session_token: str) -> None:
+    """Attach the session cookie to a response"""
+    response.set_cookie(
+        key="session_token",
+        value=session_token,
+        httponly=True,
+        max_age=7 * 24 * 60 * 60,  #7 days in seconds
+        samesite="none",  #Required for cross-origin (auth.cloud-lord.com → transcribe.cloud-lord.com)
+        secure=True,  #Required when samesite=none
+        domain=".cloud-lord.com"  #Share cookie across subdomains
+    )
+
+
 @router.post("/register", response_model=LoginResponse)
 async def register(
     request: RegisterRequest,
-    response: Response,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Register a new user"""
-    #Check if username already exists
-    existing_user = db.query(User).filter(User.username == request.username).first()
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Username already exists")
-
-    #Check if email already exists
-    existing_email = db.query(User).filter(User.email == request.email).first()
-    if existing_email:
-        raise HTTPException(status_code=400, detail="Email already exists")
+    #Check if username or email already exists
+    conflict = await auth.find_user_conflict(db, request.username, request.email)
+    if conflict:
+        raise HTTPException(status_code=400, detail=conflict)
 
     #Create new user
-    hashed_password = auth.hash_password(request.password)
+    hashed_password = await auth.run_hashing(auth.hash_password, request.password)
     new_user = User(
         username=request.username,
         email=request.email,
@@ -44,76 +58,75 @@ async def register(
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-
-    #Create session
+    try:
+        await db.flush()  #Assigns new_user.id
+    except IntegrityError:
+        #Lost a race with a concurrent registration of the same username/email
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Username or email already exists")
+
+    #Create session and persist user and session together
     session_token = auth.create_session(db, new_user.id)
+    await db.commit()
 
-    #Set session cookie
-    response.set_cookie(
-        key="session_token",
-        value=session_token,
-        httponly=True,
-        max_age=7 * 24 * 60 * 60,  #7 days in seconds
-        samesite="none",  #Required for cross-origin (auth.cloud-lord.com → transcribe.cloud-lord.com)
-        secure=True,  #Required when samesite=none
-        domain=".cloud-lord.com"  #Share cookie across subdomains
-    )
-
-    return LoginResponse(
+    response = _json_response(LoginResponse(
         success=True,
         message="Registration successful",
-        user=UserResponse.from_orm(new_user)
-    )
+        user=UserResponse.model_validate(new_user)
+    ))
+    _set_session_cookie(response, session_token)
+    return response
 
 
 @router.post("/login", response_model=LoginResponse)
 async def login(
     request: LoginRequest,
-    response: Response,
-    db: Session = Depends(get_db)
+    http_request: Request,
+    db: AsyncSession = Depends(get_db)
 ):
     """Login a user and create a session"""
+    #Reject clients with too many recent failures before spending any hashing work
+    client_ip = http_request.client.host if http_request.client else "unknown"
+    if auth.is_login_throttled(client_ip, request.username):
+        raise HTTPException(
+            status_code=429,
+            detail="Too many failed login attempts. Please try again later."
+        )
+
     #Authenticate user
-    user = auth.authenticate_user(db, request.username, request.password)
+    user = await auth.authenticate_user(db, request.username, request.password)
 
     if not user:
+        auth.record_login_failure(client_ip, request.username)
         raise HTTPException(
             status_code=401,
             detail="Invalid username or password"
         )
 
-    #Create session
-    session_token = auth.create_session(db, user.id)
+    auth.clear_login_failures(client_ip, request.username)
 
-    #Set session cookie
-    response.set_cookie(
-        key="session_token",
-        value=session_token,
-        httponly=True,
-        max_age=7 * 24 * 60 * 60,  #7 days in seconds
-        samesite="none",  #Required for cross-origin (auth.cloud-lord.com → transcribe.cloud-lord.com)
-        secure=True,  #Required when samesite=none
-        domain=".cloud-lord.com"  #Share cookie across subdomains
-    )
+    #Create session and persist it with the login timestamp in one commit
+    session_token = auth.create_session(db, user.id)
+    await db.commit()
 
-    return LoginResponse(
+    response = _json_response(LoginResponse(
         success=True,
         message="Login successful",
-        user=UserResponse.from_orm(user)
-    )
+        user=UserResponse.model_validate(user)
+    ))
+    _set_session_cookie(response, session_token)
+    return response
 
 
 @router.post("/logout")
 async def logout(
     response: Response,
     session_token: Optional[str] = Cookie(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Logout a user by invalidating their session"""
     if session_token:
-        auth.invalidate_session(db, session_token)
+        await auth.invalidate_session(db, session_token)
 
     #Clear session cookie
     response.delete_cookie(key="session_token")
@@ -124,29 +137,29 @@ async def logout(
 @router.get("/me", response_model=UserResponse)
 async def get_current_user(
     session_token: Optional[str] = Cookie(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get current authenticated user"""
     if not session_token:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    user = auth.validate_session(db, session_token)
+    user = await auth.validate_session(db, session_token)
 
     if not user:
         raise HTTPException(status_code=401, detail="Invalid or expired session")
 
-    return UserResponse.from_orm(user)
+    return _json_response(UserResponse.model_validate(user))
 
 
 @router.get("/verify")
 async def verify_session(
     session_token: Optional[str] = Cookie(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Verify if a session is valid"""
     if not session_token:
         return {"valid": False}
 
-    user = auth.validate_session(db, session_token)
+    user = await auth.validate_session(db, session_token)
 
     return {"valid": user is not None}
@@ -1,6 +1,9 @@
 """S3 client configuration and utilities"""
+import functools
 import os
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 
 
 #S3 Configuration
@@ -9,16 +12,33 @@ AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 
+#Multipart transfer settings - stream uploads in 8MB parts instead of one in-memory body
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=4,
+    use_threads=True
+)
 
+#Client settings - pooled keep-alive connections shared by all uploads
+CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    retries={"max_attempts": 3, "mode": "adaptive"},
+    tcp_keepalive=True
+)
+
+
+@functools.lru_cache(maxsize=1)
 def get_s3_client():
-    """Get S3 client with credentials from environment"""
+    """Get the shared S3 client, created on first use (boto3 clients are thread-safe for API calls)"""
     if AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY:
         return boto3.client(
             's3',
             region_name=AWS_REGION,
             aws_access_key_id=AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=AWS_SECRET_ACCESS_KEY
+            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+            config=CLIENT_CONFIG
         )
     else:
         #Use default credential chain (IAM role, etc.)
-        return boto3.client('s3', region_name=AWS_REGION)
+        return boto3.client('s3', region_name=AWS_REGION, config=CLIENT_CONFIG)
@@ -1,7 +1,7 @@
 """Pydantic request/response models for API"""
 from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr
 
 
 #Authentication schemas
@@ -18,6 +18,8 @@ class RegisterRequest(BaseModel):
 
 
 class UserResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     username: str
     email: str
@@ -25,9 +27,6 @@ class UserResponse(BaseModel):
     is_admin: bool
     last_login_at: Optional[datetime]
 
-    class Config:
-        from_attributes = True
-
 
 class LoginResponse(BaseModel):
     success: bool
@@ -45,6 +44,22 @@ class AudioUploadResponse(BaseModel):
     upload_timestamp: str
 
 
+class AudioUploadUrlRequest(BaseModel):
+    filename: str
+    content_type: str = 'audio/wav'
+
+
+class AudioUploadUrlResponse(BaseModel):
+    url: str
+    fields: dict[str, str]
+    s3_key: str
+    expires_in: int
+
+
+class AudioUploadConfirmRequest(BaseModel):
+    s3_key: str
+
+
 #Admin schemas
 class CreateUserRequest(BaseModel):
     username: str
@@ -61,26 +76,24 @@ class UpdateUserRequest(BaseModel):
 
 
 class UserListResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     username: str
     email: str
     full_name: Optional[str]
     is_active: bool
     is_admin: bool
-    created_at: str
-    last_login_at: Optional[str]
-
-    class Config:
-        from_attributes = True
+    created_at: datetime
+    last_login_at: Optional[datetime]
 
 
 class SessionListResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     user_id: int
     username: str
-    created_at: str
-    expires_at: str
+    created_at: datetime
+    expires_at: datetime
     is_valid: bool
-
-    class Config:
-        from_attributes = True
@@ -0,0 +1,104 @@
+"""Read-through cache for validated sessions (Redis when configured, otherwise in-process)"""
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from cachetools import TTLCache
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from .models import utcnow
+
+logger = logging.getLogger(__name__)
+
+#Cache configuration - entries live at most SESSION_CACHE_TTL seconds (and never past session expiry)
+SESSION_CACHE_TTL = int(os.getenv("SESSION_CACHE_TTL", "60"))  #Seconds
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+REDIS_URL = os.getenv("REDIS_URL")  #Shared cache across workers; in-process only when unset
+
+#In-process cache, token hash -> entry - used only when Redis is not configured. Evictions (logout,
+#revoke, deactivation, demotion) reach only the worker that handled them, so with several workers
+#and no Redis a revoked session stays valid on the others for up to SESSION_CACHE_TTL
+_local_cache = TTLCache(maxsize=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL)
+_local_cache_lock = threading.Lock()
+
+#Redis shared by all workers - when set it is the only cache layer, so evictions apply everywhere at once
+_redis = redis.from_url(REDIS_URL) if REDIS_URL else None
+
+
+def _key(token_hash: bytes) -> str:
+    """Redis key for a session"""
+    return f"sess:{token_hash.hex()}"
+
+
+def _user_key(user_id: int) -> str:
+    """Redis set of session keys cached for a user"""
+    return f"sess-user:{user_id}"
+
+
+async def get(token_hash: bytes) -> dict | None:
+    """Get a cached entry ({"expires_at": iso, "user": {...}}) or None on miss"""
+    if _redis is None:
+        with _local_cache_lock:
+            return _local_cache.get(token_hash)
+
+    try:
+        raw = await _redis.get(_key(token_hash))
+    except RedisError as e:
+        logger.warning("Session cache read failed: %s", e)
+        return None
+    return None if raw is None else json.loads(raw)
+
+
+async def store(token_hash: bytes, entry: dict, expires_at: datetime) -> None:
+    """Cache an entry until the cache TTL or the session expiry, whichever comes first"""
+    if _redis is None:
+        with _local_cache_lock:
+            _local_cache[token_hash] = entry
+        return
+
+    ttl = min(int((expires_at - utcnow()).total_seconds()), SESSION_CACHE_TTL)
+    if ttl <= 0:
+        return
+
+    key = _key(token_hash)
+    user_key = _user_key(entry["user"]["id"])
+    try:
+        async with _redis.pipeline(transaction=False) as pipe:
+            pipe.set(key, json.dumps(entry), ex=ttl)
+            pipe.sadd(user_key, key)
+            pipe.expire(user_key, SESSION_CACHE_TTL)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning("Session cache write failed: %s", e)
+
+
+async def evict(token_hash: bytes) -> None:
+    """Drop a session from the cache"""
+    with _local_cache_lock:
+        _local_cache.pop(token_hash, None)
+    if _redis is None:
+        return
+
+    try:
+        await _redis.delete(_key(token_hash))
+    except RedisError as e:
+        logger.warning("Session cache evict failed: %s", e)
+
+
+async def evict_user(user_id: int) -> None:
+    """Drop every cached session belonging to a user"""
+    with _local_cache_lock:
+        stale = [key for key, entry in _local_cache.items() if entry["user"]["id"] == user_id]
+        for key in stale:
+            _local_cache.pop(key, None)
+    if _redis is None:
+        return
+
+    user_key = _user_key(user_id)
+    try:
+        keys = await _redis.smembers(user_key)
+        await _redis.delete(user_key, *keys)
+    except RedisError as e:
+        logger.warning("Session cache evict failed: %s", e)
@@ -0,0 +1,42 @@
+"""ASGI middleware that caps request body size before the body is buffered"""
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+
+
+class BodySizeLimitMiddleware:
+    """Reject oversized bodies on the given paths - by Content-Length up front, then by counting streamed bytes"""
+
+    def __init__(self, app, paths: list[str], max_body_size: int):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request body too large. Maximum size is {self.max_body_size} bytes."
+
+        #Declared size - refuse without reading a single body byte
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if int(value) > self.max_body_size:
+                    response = ORJSONResponse(status_code=413, content={"detail": detail})
+                    await response(scope, receive, send)
+                    return
+                break
+
+        #Chunked or understated bodies - stop as soon as the running total passes the cap
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
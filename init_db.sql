@@ -18,7 +18,7 @@ CREATE TABLE IF NOT EXISTS users (
 CREATE TABLE IF NOT EXISTS sessions (
     id SERIAL PRIMARY KEY,
     user_id INTEGER NOT NULL,
-    session_token VARCHAR(255) UNIQUE NOT NULL,
+    session_token BYTEA UNIQUE NOT NULL,  -- BLAKE2b digest of the cookie token
     expires_at TIMESTAMP NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
     is_valid BOOLEAN DEFAULT true NOT NULL
@@ -31,6 +31,11 @@ CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id);
 CREATE INDEX IF NOT EXISTS idx_sessions_token ON sessions(session_token);
 CREATE INDEX IF NOT EXISTS idx_sessions_valid ON sessions(is_valid);
 
+-- Partial indexes covering only the rows hot lookups can match
+CREATE INDEX IF NOT EXISTS idx_users_username_active ON users(username) WHERE is_active = true;
+CREATE INDEX IF NOT EXISTS idx_sessions_token_valid ON sessions(session_token) WHERE is_valid = true;
+CREATE INDEX IF NOT EXISTS idx_sessions_user_valid ON sessions(user_id, is_valid);
+
 -- Add foreign key constraint
 ALTER TABLE sessions
     ADD CONSTRAINT fk_sessions_user_id
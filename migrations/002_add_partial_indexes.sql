@@ -0,0 +1,20 @@
+-- Migration: Add partial indexes for hot lookups
+-- Description: Login filters on active users and session validation filters on valid
+--              sessions; partial indexes keep only those rows, so the B-trees stay small
+--              as disabled users and invalidated sessions accumulate
+-- Date: 2026-10-15
+
+-- CONCURRENTLY avoids locking writes but cannot run inside a transaction block,
+-- so apply this file with plain psql -f (autocommit)
+
+-- Active users by username (authenticate_user)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_username_active
+    ON users(username) WHERE is_active = true;
+
+-- Valid sessions by token (validate_session)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_sessions_token_valid
+    ON sessions(session_token) WHERE is_valid = true;
+
+-- Sessions per user and validity (session listing and revocation)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_sessions_user_valid
+    ON sessions(user_id, is_valid);
@@ -0,0 +1,21 @@
+-- Migration: Store session tokens hashed
+-- Description: sessions.session_token now holds the 32-byte BLAKE2b digest of the cookie
+--              token instead of the token itself. Postgres cannot compute BLAKE2b, so
+--              existing plaintext tokens are kept as bytes but invalidated; affected
+--              users simply log in again
+-- Date: 2026-10-15
+
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'sessions' AND column_name = 'session_token' AND data_type <> 'bytea'
+    ) THEN
+        ALTER TABLE sessions
+            ALTER COLUMN session_token TYPE BYTEA USING convert_to(session_token, 'UTF8');
+        UPDATE sessions SET is_valid = false WHERE is_valid = true;
+        RAISE NOTICE 'Converted session_token to BYTEA and invalidated plaintext sessions';
+    ELSE
+        RAISE NOTICE 'Column session_token is already BYTEA';
+    END IF;
+END $$;
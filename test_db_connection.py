@@ -3,6 +3,7 @@
 import os
 import psycopg2
 from psycopg2 import sql
+from psycopg2.pool import ThreadedConnectionPool
 from urllib.parse import urlparse
 
 #Database URL from environment or default
@@ -22,6 +23,16 @@ def parse_database_url(url):
         'password': parsed.password
     }
 
+#Connection pool created on first use and reused by later checks in the same process
+_pool = None
+
+def get_connection_pool():
+    """Get the shared connection pool"""
+    global _pool
+    if _pool is None:
+        _pool = ThreadedConnectionPool(minconn=1, maxconn=2, **parse_database_url(DATABASE_URL))
+    return _pool
+
 def test_database_connection():
     """Test database connection and verify schema"""
     print("=" * 60)
@@ -29,6 +40,8 @@ def test_database_connection():
     print("=" * 60)
     print()
 
+    pool = None
+    conn = None
     try:
         #Parse connection URL
         conn_params = parse_database_url(DATABASE_URL)
@@ -36,8 +49,9 @@ def test_database_connection():
         print(f"User: {conn_params['user']}")
         print()
 
-        #Connect to database
-        conn = psycopg2.connect(**conn_params)
+        #Borrow a pooled connection
+        pool = get_connection_pool()
+        conn = pool.getconn()
         conn.set_session(autocommit=True)
         cur = conn.cursor()
 
@@ -152,7 +166,6 @@ def test_database_connection():
             print("\n⚠ Database needs initialization. Run init_db.sql")
 
         cur.close()
-        conn.close()
         return True
 
     except psycopg2.OperationalError as e:
@@ -163,6 +176,10 @@ def test_database_connection():
         import traceback
         traceback.print_exc()
         return False
+    finally:
+        #Return the connection to the pool on every exit path
+        if conn is not None:
+            pool.putconn(conn)
 
 if __name__ == "__main__":
     import sys